@@ -18,6 +18,8 @@ submenu_art='''Your changes are being automatically saved!
 ║ 1. Check seat.               ║
 ║ 2. Make Reservations.        ║
 ║ 3. Delete Reservations.      ║
-║ 4. Go back to the main menu. ║
+║ 4. Seat a large party.       ║
+║ 5. Check-in by age/gender.   ║
+║ 6. Go back to the main menu. ║
 ╚══════════════════════════════╝
 '''
\ No newline at end of file
@@ -0,0 +1,184 @@
+#!/bin/python3
+# Online room snapshots, taken while the rooms keep selling tickets
+# Examples:
+#   python backup.py snapshot                   (every room)
+#   python backup.py snapshot cine_room
+#   python backup.py list cine_room
+#   python backup.py restore cine_room cine_room_copy --at "2026-10-18 15:00"
+#   python backup.py schedule --every 3600 --open 10 --close 23
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+from os import listdir, makedirs, path, remove, rename
+
+from db import Database
+
+databases_path = "databases"
+snapshots_path = "snapshots"
+# Used in the snapshot file names, so they sort chronologically
+timestamp_format = "%Y%m%d-%H%M%S"
+
+
+# Lists every room saved in the databases folder
+def list_rooms():
+    try:
+        return sorted(file for file in listdir(databases_path) if file.endswith((".sqlite", ".db")))
+    except FileNotFoundError:
+        return []
+
+
+# Lists the snapshots of a room, from the oldest to the newest, as (taken_at, file path) tuples
+def list_snapshots(room: str):
+    name, ext = Database.parse_name(room)
+    folder = path.join(snapshots_path, name)
+    try:
+        files = listdir(folder)
+    except FileNotFoundError:
+        return []
+    snapshots = []
+    for file in files:
+        stem, _, file_ext = file.partition(".")
+        # Ignores unfinished snapshots and other files
+        if file_ext != ext or not stem.startswith(name + "@"):
+            continue
+        try:
+            taken_at = datetime.strptime(stem[len(name) + 1:], timestamp_format)
+        except ValueError:
+            continue
+        snapshots.append((taken_at, path.join(folder, file)))
+    return sorted(snapshots)
+
+
+# Prints how long a copy took and how fast it was
+def print_throughput(label: str, page_count: int, page_size: int, elapsed: float):
+    size = page_count * page_size / 1024 / 1024
+    print(f"{label}: {page_count} pages ({size:.2f} MiB) in {elapsed:.3f}s,",
+          f"{page_count / max(elapsed, 1e-9):.0f} pages/s, {size / max(elapsed, 1e-9):.2f} MiB/s")
+
+
+# Takes a point in time snapshot of a room, returning the snapshot path
+# Raises FileNotFoundError if the room doesn't exist
+def snapshot_room(room: str, pages: int = 64, sleep: float = 0.005):
+    # Opening a missing room would create an empty one
+    if not path.exists(Database.path_of(room)):
+        raise FileNotFoundError(f"The database {room} doesn't exist")
+    db = Database(room)
+    folder = path.join(snapshots_path, db.name)
+    makedirs(folder, exist_ok=True)
+    taken_at = datetime.now()
+    target = path.join(folder, f"{db.name}@{taken_at.strftime(timestamp_format)}.{db.ext}")
+    # Copies to a temporary name first, so a partial snapshot is never mistaken for a complete one
+    partial = target + ".partial"
+
+    start = time.perf_counter()
+    try:
+        page_count, page_size = db.snapshot(partial, pages, sleep)
+    except BaseException:
+        if path.exists(partial):
+            remove(partial)
+        raise
+    finally:
+        db.close()
+    rename(partial, target)
+    print_throughput(f"{db.name}.{db.ext} -> {target}", page_count, page_size, time.perf_counter() - start)
+    return target
+
+
+# Restores the latest snapshot of a room taken at or before the given time into a new database
+# Raises FileExistsError if the new database already exists, and LookupError if there is no snapshot
+def restore_room(room: str, new_name: str, at: datetime = None, pages: int = 64):
+    candidates = [snapshot for snapshot in list_snapshots(room) if at is None or snapshot[0] <= at]
+    if not candidates:
+        raise LookupError(f"There is no snapshot of {room} to restore")
+    taken_at, snapshot = candidates[-1]
+
+    # Never overwrites a live room
+    target_path = Database.path_of(new_name)
+    if path.exists(target_path):
+        raise FileExistsError(f"The database {new_name} already exists")
+    makedirs(databases_path, exist_ok=True)
+    # Restores to a temporary name first, so a failed restore doesn't leave a broken room behind
+    partial = target_path + ".partial"
+    source = sqlite3.connect(snapshot)
+    target = sqlite3.connect(partial)
+    start = time.perf_counter()
+    try:
+        source.backup(target, pages=pages)
+        page_size = source.execute('PRAGMA page_size').fetchone()[0]
+        page_count = source.execute('PRAGMA page_count').fetchone()[0]
+    except BaseException:
+        target.close()
+        remove(partial)
+        raise
+    finally:
+        source.close()
+        target.close()
+    rename(partial, target_path)
+    print_throughput(f"{snapshot} ({taken_at}) -> {target_path}", page_count, page_size,
+                     time.perf_counter() - start)
+    return target_path
+
+
+# Snapshots every room periodically, but only during business hours
+def schedule(every: float, opening: int, closing: int, pages: int, sleep: float):
+    while True:
+        hour = datetime.now().hour
+        if opening <= hour < closing:
+            for room in list_rooms():
+                try:
+                    snapshot_room(room, pages, sleep)
+                except (sqlite3.Error, OSError) as e:
+                    # One broken or removed room must not stop the others from being saved
+                    print(f"Could not snapshot {room}: {e}")
+        time.sleep(every)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Takes and restores online snapshots of the rooms.")
+    parser.add_argument("--pages", type=int, default=64, help="pages copied per step")
+    parser.add_argument("--sleep", type=float, default=0.005, help="seconds to pause between steps")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = commands.add_parser("snapshot", help="snapshots the given rooms, or every room")
+    snapshot_parser.add_argument("rooms", nargs="*")
+
+    list_parser = commands.add_parser("list", help="lists the snapshots of a room")
+    list_parser.add_argument("room")
+
+    restore_parser = commands.add_parser("restore", help="restores a room snapshot into a new database")
+    restore_parser.add_argument("room")
+    restore_parser.add_argument("new_name")
+    restore_parser.add_argument("--at", type=datetime.fromisoformat, default=None,
+                                help="restores the latest snapshot taken until this time (YYYY-MM-DD HH:MM)")
+
+    schedule_parser = commands.add_parser("schedule", help="snapshots every room during business hours")
+    schedule_parser.add_argument("--every", type=float, default=3600., help="seconds between snapshots")
+    schedule_parser.add_argument("--open", type=int, default=9, help="hour the business opens")
+    schedule_parser.add_argument("--close", type=int, default=23, help="hour the business closes")
+
+    args = parser.parse_args()
+    match args.command:
+        case "snapshot":
+            for room in args.rooms or list_rooms():
+                try:
+                    snapshot_room(room, args.pages, args.sleep)
+                except FileNotFoundError as e:
+                    print(e.args[0])
+        case "list":
+            for taken_at, snapshot in list_snapshots(args.room):
+                print(taken_at, "-", snapshot)
+        case "restore":
+            try:
+                restore_room(args.room, args.new_name, args.at, args.pages)
+            except (LookupError, FileExistsError) as e:
+                parser.error(e.args[0])
+        case "schedule":
+            try:
+                schedule(args.every, args.open, args.close, args.pages, args.sleep)
+            except KeyboardInterrupt:
+                print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+# Packs a list of booleans into bytes, one bit per seat
+def pack_bits(bits: list):
+    packed = bytearray((len(bits) + 7) // 8)
+    for index, bit in enumerate(bits):
+        if bit:
+            packed[index // 8] |= 1 << (index % 8)
+    return bytes(packed)
+
+
+# Least recently used cache of rendered seat maps, shared by every room
+# Entries are keyed by (room, version, view), and hold the rendered frame and the packed occupancy of the view
+# The cache is bounded by the total size of its entries, evicting the least recently used ones first
+class RenderCache:
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # The latest version cached for each (room, view), older versions are never read again
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    # Retrieves the (frame, occupancy) entry, or None if it is not cached
+    def get(self, room: str, version: int, view):
+        with self._lock:
+            entry = self._entries.get((room, version, view))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((room, version, view))
+            self.hits += 1
+            return entry
+
+    # Saves an entry, replacing the older versions of the same room and view
+    def put(self, room: str, version: int, view, frame: str, occupancy: bytes):
+        with self._lock:
+            previous = self._latest.get((room, view))
+            if previous is not None and previous > version:
+                # A newer version was already rendered, this one is outdated
+                return
+            if previous is not None:
+                self._remove((room, previous, view))
+            self._latest[(room, view)] = version
+            self._entries[(room, version, view)] = (frame, occupancy)
+            self.size += self._entry_size(frame, occupancy)
+
+            # Evicts the least recently used entries, from any room
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                (old_room, old_version, old_view), _ = next(iter(self._entries.items()))
+                self._remove((old_room, old_version, old_view))
+                if self._latest.get((old_room, old_view)) == old_version:
+                    del self._latest[(old_room, old_view)]
+
+    # Forgets every entry
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= self._entry_size(*entry)
+
+    @staticmethod
+    def _entry_size(frame: str, occupancy: bytes):
+        # Box drawing characters take 3 bytes each in UTF-8
+        return len(frame) * 3 + len(occupancy)
+
+
+# Used by every manager in the process
+render_cache = RenderCache()
@@ -1,7 +1,11 @@
 #!/bin/python3
 from db import *  # Interaction with the CRUD
 from os import getcwd, listdir, makedirs  # Interaction with the file system
+from datetime import datetime  # Formatting of the sales buckets
+import time  # Timestamps of the sales pacing
+from sqlite3 import IntegrityError  # Raised when a seat is taken by someone else meanwhile
 from art import *  # Menus and other visible content
+from cache import render_cache, pack_bits  # Reuses rendered maps while the room doesn't change
 from utils import *  # Useful functions for a variety of circumstances
 
 # Saves the current dir_path globally
@@ -11,6 +15,9 @@ databases_path = dir_path + "/databases"
 # Sets the global gender variable
 genders = ["male", "female", "other", "unspecified"]
 
+# The widest room whose map fits the terminal, rows are limited by the alphabet
+max_columns = 18
+
 
 # Defines the manager class
 class Manager:
@@ -20,7 +27,15 @@ class Manager:
         self.ticket_price = None
         self.rows = None
         self.columns = None
+        # The id of the latest relayout loaded, every seat write checks that it is still the current one
+        self.layout = None
     
+    # Another manager of the same room may have changed its layout, so reloads the options from the database
+    def _refresh_options(self):
+        db_layout = self.db.get_layout()
+        if db_layout is not None:
+            self.layout, self.ticket_price, self.rows, self.columns = db_layout
+
     # Takes the row and column index, and converts it to the seat id
     # Returns KeyError if the seat id is out of the room limits
     def calculate_id(self, row: int, column: int):
@@ -34,22 +49,73 @@ class Manager:
         return row * self.columns + column
     
     # Prints the current seat map based on the available information
-    def print_map(self):
-        occupied_seats = [seat[0] for seat in self.db.get_occupied()]
-        for row in range(self.rows):
-            print("  ", end="")
-            print("╔════╗ " * self.columns)  # customization done
-            print(alphabet[row], end=" ")
-            for i in range(self.columns):
-                print(f"║ {'웃' if row * self.columns + i in occupied_seats else '  '} ║", end=" ")  # customization done
-            print()
-            print("  ", end="")
-            print("╚════╝ " * self.columns)  # customization done
-        # Prints the column numbers
-        print("  ", end="")
-        for column in range(self.columns):
-            print(f"  {column + 1:0>2}  ", end=" ")
-        print()
+    # highlight is a find_seats filter, as a (min_age, max_age, gender, rows) tuple, whose seats are highlighted
+    def print_map(self, highlight: tuple = None):
+        print(self.render_map(highlight=highlight), end="")
+
+    # Splits a viewport into row and column ranges, the default viewport is the whole room
+    # A viewport is a (first_row, last_row, first_column, last_column) tuple, with the last ones excluded
+    # rows and columns are the dimensions of the room, the current ones by default
+    def viewport_ranges(self, viewport=None, rows: int = None, columns: int = None):
+        rows = rows or self.rows
+        columns = columns or self.columns
+        first_row, last_row, first_column, last_column = viewport or (0, rows, 0, columns)
+        return range(max(first_row, 0), min(last_row, rows)), \
+            range(max(first_column, 0), min(last_column, columns))
+
+    # Returns the seat map of the viewport and its packed occupancy, one bit per seat
+    # Both are cached per room version, so they are only rebuilt after the room changes
+    def _map_entry(self, viewport=None, highlight: tuple = None):
+        # Viewports and rows may be lists, but they are part of the cache key, which must be hashable
+        if viewport is not None:
+            viewport = tuple(viewport)
+        if highlight is not None:
+            min_age, max_age, gender, rows = highlight
+            highlight = min_age, max_age, gender, None if rows is None else tuple(rows)
+        version = self.db.get_version()
+        entry = render_cache.get(self.db.path, version, (viewport, highlight))
+        if entry is not None:
+            return entry
+
+        # The version and the seats are read together, so the entry always matches its version
+        # The map is drawn with the dimensions of the snapshot, which may differ from self after a relayout
+        version, occupied, options = self.db.get_snapshot()
+        _, room_rows, room_columns = options or (None, self.rows, self.columns)
+        occupied_seats = {seat[0] for seat in occupied}
+        # The highlighted seats come from the indexes, instead of filtering every occupant
+        highlighted_seats = set()
+        if highlight is not None:
+            highlighted_seats = {seat[0] for seat in self._find_seats(*highlight, columns=room_columns)}
+        rows, columns = self.viewport_ranges(viewport, room_rows, room_columns)
+        lines = []
+        bits = []
+        for row in rows:
+            lines.append("  " + "╔════╗ " * len(columns))  # customization done
+            cells = []
+            for column in columns:
+                seat_id = row * room_columns + column
+                is_occupied = seat_id in occupied_seats
+                bits.append(is_occupied)
+                if seat_id in highlighted_seats:
+                    cells.append(f"║ {colors.YELLOW}{colors.BOLD}웃{colors.END} ║ ")
+                else:
+                    cells.append(f"║ {'웃' if is_occupied else '  '} ║ ")  # customization done
+            lines.append(alphabet[row] + " " + "".join(cells))
+            lines.append("  " + "╚════╝ " * len(columns))  # customization done
+        # The column numbers
+        lines.append("  " + "".join(f"  {column + 1:0>2}   " for column in columns))
+        entry = "\n".join(lines) + "\n", pack_bits(bits)
+        render_cache.put(self.db.path, version, (viewport, highlight), *entry)
+        return entry
+
+    # Renders the seat map of the viewport (see viewport_ranges) as a string
+    # highlight is a find_seats filter, as a (min_age, max_age, gender, rows) tuple, whose seats are highlighted
+    def render_map(self, viewport=None, highlight: tuple = None):
+        return self._map_entry(viewport, highlight)[0]
+
+    # The occupancy of the viewport (see viewport_ranges), one bit per seat in row order
+    def occupancy_snapshot(self, viewport=None):
+        return self._map_entry(viewport)[1]
     
     # Clears the amount of lines printed by the map
     def clear_map(self):
@@ -79,30 +145,181 @@ class Manager:
         return True
     
     # This function should add a new seat to the database
+    # Raises ValueError if another manager changed the layout meanwhile, after reloading it
     def book_seat(self, row: int, column: int, age: int, gender: int):
         seat_id = self.calculate_id(row, column)
 
         # If the seat is free, saves the new occupant
+        # Returns True if the seat was booked, False if it was already taken
         if self.db.get_seat(seat_id) is None:
-            self.db.save_seat(seat_id, age, gender)
+            try:
+                self.db.save_seat(seat_id, age, gender, self.ticket_price_for(age), self.layout)
+            except IntegrityError:
+                # Another thread or process took the seat between the check and the insert
+                return False
+            except ValueError:
+                # The seat id was computed in an outdated layout, the next calls use the new one
+                self._refresh_options()
+                raise
+            return True
+        return False
     
     # This function should remove a seat from the database
+    # Raises ValueError if another manager changed the layout meanwhile, after reloading it
     def unbook_seat(self, row: int, column: int):
         seat_id = self.calculate_id(row, column)
 
         # If the seat is occupied, clears it
+        # Returns True if the seat was cleared, False if it was already empty
         if self.db.get_seat(seat_id):
-            self.db.remove_seat(seat_id)
-            
+            try:
+                self.db.remove_seat(seat_id, self.layout)
+            except ValueError:
+                self._refresh_options()
+                raise
+            return True
+        return False
+
     
+    # Finds the most compact and central block of free seats for a party, across adjacent rows if needed
+    # Every row of the block holds the same columns, except one end row, which holds the rest of the party centered
+    # spacing is the amount of empty seats kept on both sides of the party, to separate it from other groups
+    # Returns a list of (row, column) tuples, or None if there is no place for the party
+    def find_group_seats(self, party_size: int, spacing: int = 0):
+        self._refresh_options()
+        occupied = {seat[0] for seat in self.db.get_occupied()}
+
+        # Summarizes the free space of each row with a single pass over the room
+        # taken_before[row][column] is the amount of occupied seats before the column,
+        # so any run of seats is checked at once, and longest_run skips rows where the block can't fit
+        taken_before = []
+        longest_run = []
+        for row in range(self.rows):
+            counts = [0]
+            run = longest = 0
+            for column in range(self.columns):
+                is_taken = row * self.columns + column in occupied
+                counts.append(counts[-1] + is_taken)
+                run = 0 if is_taken else run + 1
+                longest = max(longest, run)
+            taken_before.append(counts)
+            longest_run.append(longest)
+
+        # Validates if a run of seats and the spacing around it are free
+        def is_free(row, start, width):
+            if longest_run[row] < width:
+                return False
+            first = max(start - spacing, 0)
+            last = min(start + width + spacing, self.columns)
+            return taken_before[row][last] == taken_before[row][first]
+
+        center_row = (self.rows - 1) / 2
+        center_column = (self.columns - 1) / 2
+        best = None
+        best_score = float('inf')
+        for height in range(1, self.rows + 1):
+            width = -(-party_size // height)  # Rounds up
+            # Skips blocks that are too wide, or that would leave a row empty
+            if width > self.columns or (height - 1) * width >= party_size:
+                continue
+            remainder = party_size - (height - 1) * width
+
+            # The score is the block perimeter (compactness) plus its distance from the center (centrality)
+            # Candidates are visited from the center outwards, so the search stops as soon as they can't win
+            perimeter = 2 * (width + height)
+            if perimeter >= best_score:
+                continue
+            tops = sorted(range(self.rows - height + 1),
+                          key=lambda top: abs(top + (height - 1) / 2 - center_row))
+            starts = sorted(range(self.columns - width + 1),
+                            key=lambda start: abs(start + (width - 1) / 2 - center_column))
+            for top in tops:
+                row_distance = abs(top + (height - 1) / 2 - center_row)
+                if perimeter + row_distance >= best_score:
+                    break
+                for start in starts:
+                    score = perimeter + row_distance + abs(start + (width - 1) / 2 - center_column)
+                    if score >= best_score:
+                        break
+                    # The remainder of the party sits either in the back or in the front row of the block
+                    for partial_row in dict.fromkeys((top + height - 1, top)):
+                        partial_start = start + (width - remainder) // 2
+                        if is_free(partial_row, partial_start, remainder) and all(
+                                is_free(row, start, width) for row in range(top, top + height) if row != partial_row):
+                            best = top, height, start, width, partial_row, partial_start, remainder
+                            best_score = score
+                            break
+
+        if best is None:
+            return None
+        top, height, start, width, partial_row, partial_start, remainder = best
+        seats = []
+        for row in range(top, top + height):
+            if row == partial_row:
+                seats.extend((row, column) for column in range(partial_start, partial_start + remainder))
+            else:
+                seats.extend((row, column) for column in range(start, start + width))
+        return seats
+
+    # Seats a party in the block found by find_group_seats, occupants are (age, gender) tuples
+    # When seats are given (e.g. the block already confirmed by the user), books exactly those seats instead
+    # Returns the booked (row, column) tuples, or None if there is no place for the party
+    # or any of the given seats was taken meanwhile
+    # Raises ValueError if another manager changed the layout meanwhile, after reloading it
+    def book_group(self, occupants: list, spacing: int = 0, attempts: int = 3, seats: list = None):
+        if seats is not None and len(seats) != len(occupants):
+            raise ValueError("Every occupant needs exactly one seat")
+        for _ in range(1 if seats is not None else attempts):
+            if seats is None:
+                seats = self.find_group_seats(len(occupants), spacing)
+                if seats is None:
+                    return None
+            try:
+                # Every seat is saved in a single transaction, so the party is never split
+                self.db.save_seats([(self.calculate_id(row, column), age, gender, self.ticket_price_for(age))
+                                    for (row, column), (age, gender) in zip(seats, occupants)], self.layout)
+                return seats
+            except IntegrityError:
+                # Another cashier took one of the seats meanwhile, so searches again
+                seats = None
+            except ValueError:
+                self._refresh_options()
+                raise
+        return None
+
     # Retrieves the specified seat
     def get_seat(self, row: int, column: int):
         seat_id = self.calculate_id(row, column)
         return self.db.get_seat(seat_id)
 
+    # Minors and elders pay half of the ticket price
+    def ticket_price_for(self, age: int):
+        if 17 < age < 60:
+            return self.ticket_price
+        return self.ticket_price / 2
+
+    # Streams the occupied seats matching every given filter as (seat_id, age, gender) tuples
+    # columns is the width of the room used to convert the rows, the current one by default
+    def _find_seats(self, min_age: int = None, max_age: int = None, gender: int = None, rows=None,
+                    columns: int = None):
+        columns = columns or self.columns
+        seat_ranges = None
+        if rows is not None:
+            # Each row is a range of consecutive IDs
+            seat_ranges = [(row * columns, (row + 1) * columns - 1) for row in rows]
+        return self.db.find_seats(min_age, max_age, gender, seat_ranges)
+
+    # Streams the labels (e.g. A1) of the occupied seats that match every given filter
+    # Ages are inclusive, and rows is an iterable of row indexes
+    def find_seats(self, min_age: int = None, max_age: int = None, gender: int = None, rows=None):
+        self._refresh_options()
+        for seat_id, _, _ in self._find_seats(min_age, max_age, gender, rows):
+            yield f"{alphabet[seat_id // self.columns]}{seat_id % self.columns + 1}"
+
     # Retrieves every seat from the database, and returns related information
     # Tuple with (row_key, column_n, age, gender, ticket_price)
     def seat_list(self):
+        self._refresh_options()
         seats = []
         for seat_id, age, gender in self.db.get_occupied():
             row = seat_id // self.columns
@@ -110,32 +327,129 @@ class Manager:
 
             row_key = alphabet[row]
             column_n = column + 1
-            if 17 < age < 60:
-                ticket_price = self.ticket_price
-            else:
-                ticket_price = self.ticket_price / 2
+            ticket_price = self.ticket_price_for(age)
 
             seats.append((row_key, column_n, age, gender, ticket_price))
         return seats
 
+    # Sums the sales of the last minutes from the per minute rollups
+    # Tuple with (bookings, cancellations, revenue, bookings_per_hour)
+    def sales_pace(self, minutes: int = 30):
+        buckets = self.db.get_sales(MINUTE, time.time() - minutes * 60)
+        bookings = sum(bucket[1] for bucket in buckets)
+        cancellations = sum(bucket[2] for bucket in buckets)
+        revenue = sum(bucket[3] for bucket in buckets)
+        return bookings, cancellations, revenue, bookings * 60 / minutes
+
+    # The hour with the most bookings in the last days, or None if nothing was booked
+    # Tuple with (hour_start, bookings, cancellations, revenue)
+    def peak_hour(self, days: int = 7):
+        peak = self.db.get_peak_sales(HOUR, time.time() - days * DAY)
+        if peak is None:
+            return None
+        bucket, bookings, cancellations, revenue, _, _ = peak
+        return datetime.fromtimestamp(bucket), bookings, cancellations, revenue
+
     
     # Simple database update, discards the previous if it exists
     def set_database(self, db: Database):
         # Saves the database
         self.db = db
         # Verifies if the database is already initialized
-        db_options = self.db.get_options()
-        if db_options is not None:
+        db_layout = self.db.get_layout()
+        if db_layout is not None:
             # Sets the database variables in the object
-            self.ticket_price, self.rows, self.columns = db_options
+            self.layout, self.ticket_price, self.rows, self.columns = db_layout
             return True
     
     # Updates the object variables and saves them to the database options
+    # Raises ValueError if the dimensions change while there are reservations, use resize instead
     def set_options(self, ticket_price: float, rows: int, columns: int):
-        self.ticket_price = ticket_price
-        self.rows = rows
-        self.columns = columns
         self.db.save_options(ticket_price, rows, columns)
+        self._refresh_options()
+
+    # Changes the room layout, moving every reservation to its new seat in a single transaction
+    # new_row and new_column are SQL expressions of the old row (r) and column (c), see Database.relayout_seats
+    # Returns the reservations that no longer fit, as (row_key, column_n, age, gender) tuples of the old layout
+    # If there are any, the layout is kept as it was, unless drop_displaced is True, which cancels them
+    # Raises ValueError if the new dimensions are not supported
+    def _relayout(self, rows: int, columns: int, new_row: str = "r", new_column: str = "c",
+                  parameters: dict = None, drop_displaced: bool = False):
+        if not 1 <= rows <= len(alphabet) or not 1 <= columns <= max_columns:
+            raise ValueError(f"The room must have 1-{len(alphabet)} rows and 1-{max_columns} columns")
+        displaced = self.db.relayout_seats(self.columns, self.ticket_price, rows, columns,
+                                           new_row, new_column, parameters, drop_displaced, self.layout)
+        labels = [(alphabet[seat_id // self.columns], seat_id % self.columns + 1, age, gender)
+                  for seat_id, age, gender in displaced]
+        if drop_displaced or not displaced:
+            # Loads the new layout id along with the dimensions
+            self._refresh_options()
+        return labels
+
+    # Validates a row index, end also allows the position after the last row, where new rows are appended
+    # Raises KeyError if the row is out of the room limits
+    def _check_row(self, row: int, end: bool = False):
+        if not 0 <= row < self.rows + end:
+            raise KeyError(f"The row must be within A-{alphabet[self.rows - 1]}" + (", or the end" if end else ""))
+
+    # Validates a column index, end also allows the position after the last column
+    # Raises KeyError if the column is out of the room limits
+    def _check_column(self, column: int, end: bool = False):
+        if not 0 <= column < self.columns + end:
+            raise KeyError(f"The column must be within 1-{self.columns}" + (", or the end" if end else ""))
+
+    # Changes the amount of rows and columns, every seat keeps its row and column
+    def resize(self, rows: int, columns: int, drop_displaced: bool = False):
+        self._refresh_options()
+        return self._relayout(rows, columns, drop_displaced=drop_displaced)
+
+    # Inserts an empty row before the given row, moving the next rows back
+    def insert_row(self, row: int, drop_displaced: bool = False):
+        self._refresh_options()
+        self._check_row(row, end=True)
+        return self._relayout(self.rows + 1, self.columns, "r + (r >= :row)",
+                              parameters={"row": row}, drop_displaced=drop_displaced)
+
+    # Removes the given row, moving the next rows forward
+    def remove_row(self, row: int, drop_displaced: bool = False):
+        self._refresh_options()
+        self._check_row(row)
+        return self._relayout(self.rows - 1, self.columns, "CASE WHEN r = :row THEN NULL ELSE r - (r > :row) END",
+                              parameters={"row": row}, drop_displaced=drop_displaced)
+
+    # Inserts an empty column before the given column, moving the next columns to the right
+    def insert_column(self, column: int, drop_displaced: bool = False):
+        self._refresh_options()
+        self._check_column(column, end=True)
+        return self._relayout(self.rows, self.columns + 1, new_column="c + (c >= :column)",
+                              parameters={"column": column}, drop_displaced=drop_displaced)
+
+    # Removes the given column, moving the next columns to the left
+    def remove_column(self, column: int, drop_displaced: bool = False):
+        self._refresh_options()
+        self._check_column(column)
+        return self._relayout(self.rows, self.columns - 1,
+                              new_column="CASE WHEN c = :column THEN NULL ELSE c - (c > :column) END",
+                              parameters={"column": column}, drop_displaced=drop_displaced)
+
+    # Shifts the reservations of a block by the given offsets, the block is a viewport (see viewport_ranges)
+    def shift_block(self, viewport: tuple, row_offset: int, column_offset: int, drop_displaced: bool = False):
+        self._refresh_options()
+        first_row, last_row, first_column, last_column = viewport
+        # The block must hold at least one seat of the room, the offsets may still move it out
+        self._check_row(first_row)
+        self._check_row(last_row - 1)
+        self._check_column(first_column)
+        self._check_column(last_column - 1)
+        if first_row >= last_row or first_column >= last_column:
+            raise KeyError("The block must not be empty")
+        in_block = "r >= :first_row AND r < :last_row AND c >= :first_column AND c < :last_column"
+        return self._relayout(self.rows, self.columns,
+                              f"CASE WHEN {in_block} THEN r + :row_offset ELSE r END",
+                              f"CASE WHEN {in_block} THEN c + :column_offset ELSE c END",
+                              {"first_row": first_row, "last_row": last_row, "first_column": first_column,
+                               "last_column": last_column, "row_offset": row_offset, "column_offset": column_offset},
+                              drop_displaced)
 
 
 # Converts a key/number (e.g. A1) into the row and column indexes
@@ -185,7 +499,7 @@ def initialize_manager(manager):
     if not is_initialized:
         ticket_price = ask_number("Please, specify the ticket price: ", float, 0.01)
         rows = ask_number("Please, specify the amount of rows in the movie theater: ", int, 1, 26)
-        columns = ask_number("Please, specify the amount of columns in the movie theater: ", int, 1, 18)
+        columns = ask_number("Please, specify the amount of columns in the movie theater: ", int, 1, max_columns)
 
         manager.set_options(ticket_price, rows, columns)
     
@@ -365,6 +679,82 @@ def unbook_seats(manager):
     manager.clear_map()
 
 
+# Function 2.4, used to seat a large party across adjacent rows
+def book_party(manager):
+    manager.print_map()
+    print()
+    # Tracks how many lines to clear
+    printed = 3
+
+    party_size = ask_number("Specify how many people are in the party: ", int, 1, manager.rows * manager.columns)
+    spacing = ask_number("Specify how many empty seats to keep on each side of the party: ", int, 0)
+    seats = manager.find_group_seats(party_size, spacing)
+    if seats is None:
+        print("There is no block of free seats for this party")
+        printed += 1
+    else:
+        # Prints the suggested seats, one row per line
+        print("Suggested seats:")
+        rows = {}
+        for row, column in seats:
+            rows.setdefault(row, []).append(column)
+        for row, columns in rows.items():
+            print(f"{alphabet[row]}{columns[0] + 1}-{alphabet[row]}{columns[-1] + 1}")
+        printed += 2 + len(rows)
+
+        # Members are registered in groups sharing the same age and gender (e.g. students and teachers)
+        occupants = []
+        gender_initials = [gender[0] for gender in genders]
+        while len(occupants) < party_size:
+            remaining = party_size - len(occupants)
+            count = ask_number(f"How many of the {remaining} remaining members share the same age and gender? ",
+                               int, 1, remaining)
+            age = ask_number("Please, enter their age: ", int, 1)
+            print("Choose one of the genders from:",
+                  ', '.join([f"{g} ({gender})" for g, gender in zip(gender_initials, genders)]))
+            gender = ask_from_list("Your choice: ", gender_initials)
+            clear_lines()
+            print(f"{count} x {age} years old, {genders[gender]}")
+            printed += 1
+            occupants.extend([(age, gender)] * count)
+
+        if ask_boolean("Are you sure that you want to book these seats? [y/n]"):
+            # Books exactly the confirmed seats, never a different block
+            if manager.book_group(occupants, spacing, seats=seats):
+                print("The party was seated in the suggested seats")
+            else:
+                print("Some of these seats were taken meanwhile, no seat was booked")
+        else:
+            print("No seat was booked")
+
+    print()
+    wait_key("Press any key to continue...")
+    clear_lines(printed)
+    manager.clear_map()
+
+
+# Function 2.5, used to check-in occupants of a given age bracket and gender
+def check_in(manager):
+    min_age = ask_number("Specify the minimum age to check-in: ", int, 0)
+    max_age = ask_number("Specify the maximum age to check-in: ", int, min_age)
+    gender_initials = [gender[0] for gender in genders]
+    print("Choose one of the genders from:",
+          ', '.join([f"{g} ({gender})" for g, gender in zip(gender_initials, genders)]), "or a (any)")
+    gender = ask_from_list("Your choice: ", gender_initials + ["a"])
+    clear_lines()
+    # The last option means any gender
+    highlight = min_age, max_age, gender if gender < len(genders) else None, None
+
+    manager.print_map(highlight)
+    print()
+    matches = sum(1 for _ in manager.find_seats(*highlight))
+    print(f"{matches} matching seats are highlighted")
+    print()
+    wait_key("Press any key to continue...")
+    clear_lines(4)
+    manager.clear_map()
+
+
 # Function 3, used to delete every seat in the room
 def room_clear(manager):
     # Verifies the amount of booked seats
@@ -409,6 +799,8 @@ def generate_reports(manager):
         print()
         wait_key("Press any key to continue...")
         clear_lines(3)
+        # The pacing still matters when every booking was cancelled
+        display_sales_pacing(manager)
         return
     print("╔══════════════════╗")
     print("║ Reservation list ║")
@@ -493,6 +885,28 @@ def generate_reports(manager):
     # Clears the third report
     clear_lines(14 + (bng > 0) * 2 + (onu > 0) * 2)
 
+    display_sales_pacing(manager)
+
+
+# Helper function to display the sales pacing in generate reports
+# It is based on the rollups instead of the reservation list, so it works on empty rooms too
+def display_sales_pacing(manager):
+    print("╔══════════════╗")
+    print("║ Sales pacing ║")
+    print("╚══════════════╝")
+    bookings, cancellations, revenue, per_hour = manager.sales_pace(30)
+    print(f"Last 30 minutes: {bookings} bookings, {cancellations} cancellations, ${revenue:.2f}",
+          f"({per_hour:.1f} bookings per hour)")
+    peak = manager.peak_hour(7)
+    if peak:
+        hour_start, bookings, cancellations, revenue = peak
+        print(f"Peak booking hour this week: {hour_start:%Y-%m-%d %H:00} ({bookings} bookings, ${revenue:.2f})")
+    else:
+        print("Nothing was booked this week")
+    print()
+    wait_key("Press any key to continue...")
+    clear_lines(7)
+
 
 # Helper function to display the age bars in generate reports
 def display_loading_bar(total, age, name):
@@ -521,13 +935,13 @@ def submenu(manager):
             func = int(wait_key("Choose function to start: "))
         # In case the user interrupts, exits the submenu
         except KeyboardInterrupt:
-            func = 4
+            func = 6
         # If the selection is not a valid number, ignore
         except ValueError:
             continue
         finally:
             # Clears the submenu
-            clear_lines(12)
+            clear_lines(14)
         match func:
             case 1:
                 # Prints the age and gender of the occupant of given seat
@@ -539,6 +953,12 @@ def submenu(manager):
                 # Removes a seat's data from the room
                 unbook_seats(manager)
             case 4:
+                # Finds and books a block of seats for a large party
+                book_party(manager)
+            case 5:
+                # Highlights the occupants to check-in
+                check_in(manager)
+            case 6:
                 # Breaks the submenu loop and return to the main menu
                 break
 
@@ -1,8 +1,105 @@
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Seat event kinds
+BOOKING = 0
+CANCELLATION = 1
+RELOCATION = 2
+
+# Change feed kinds
+SEAT_SAVED = 0
+SEAT_REMOVED = 1
+SEATS_DROPPED = 2
+OPTIONS_SAVED = 3
+RELAYOUT = 4
+
+# Rollup granularities, in seconds
+MINUTE = 60
+HOUR = 60 * 60
+DAY = 24 * 60 * 60
+granularities = (MINUTE, HOUR, DAY)
+
+
+# The start of the local time bucket that contains the given timestamp
+def bucket_start(timestamp: float, granularity: int):
+    offset = datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds()
+    return int((timestamp + offset) // granularity * granularity - offset)
+
+
+# Hands out connections from a bounded pool, so every thread works with its own connection
+# Each connection keeps its own prepared statement cache, so repeated queries are reused
+class ConnectionPool:
+    def __init__(self, connect, size: int, timeout: float = None):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        # LIFO keeps the most recently used (and warmest) connections in use
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # Adds an already opened connection to the idle connections
+    def add(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.append(conn)
+        self._idle.put(conn)
+
+    # Leases a connection, opening a new one if none is idle and the pool is not full
+    # Raises TimeoutError if every connection stays busy for longer than the timeout
+    @contextmanager
+    def lease(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection was released within {self.timeout}s")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                with self._lock:
+                    self._connections.append(conn)
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    # Closes every connection ever opened by the pool
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
 
 
 class Database:
-    def __init__(self, database_name):
+    # A pool_size above 0 enables the pooled mode, which is safe to share between threads
+    # Pooled databases default to the WAL journal, so readers don't wait for writers
+    # busy_timeout is how long to wait for a database lock, pool_timeout how long to wait for a free connection
+    def __init__(self, database_name, pool_size: int = 0, journal_mode: str = None,
+                 busy_timeout: float = 5., cached_statements: int = 128, pool_timeout: float = 30.):
+        self.name, self.ext = self.parse_name(database_name)
+        self.path = self.path_of(database_name)
+        self.pool_size = pool_size
+        self.journal_mode = journal_mode or ('wal' if pool_size else None)
+        self.busy_timeout = busy_timeout
+        self.pool_timeout = pool_timeout
+        self.cached_statements = cached_statements
+
+        self.pool = None
+        self.conn = None
+        self.cursor = None
+        self._initialize()
+
+
+    # Sanitizes a database name, returning its name and extension
+    @staticmethod
+    def parse_name(database_name):
         # Prevents exploits
         database_name = database_name.replace("/", "")
         # Prevents bugs
@@ -11,25 +108,39 @@ class Database:
 
         # If no extension was specified
         if '.' not in database_name:
-            self.name = database_name
-            self.ext = "sqlite"
+            name = database_name
+            ext = "sqlite"
         else:
-            self.name, self.ext = database_name.split('.', 1)
+            name, ext = database_name.split('.', 1)
             # In case the ext is not in the whitelist...
-            if self.ext not in {'sqlite', 'db'}:
-                self.ext = "sqlite"
+            if ext not in {'sqlite', 'db'}:
+                ext = "sqlite"
         
-        if self.name == '':
-            self.name = 'cine_room'
-        
-        self.conn = None
-        self.cursor = None
-        self._initialize()
+        if name == '':
+            name = 'cine_room'
+        return name, ext
+
+
+    # The path of the file that stores the given database, without opening it
+    @staticmethod
+    def path_of(database_name):
+        name, ext = Database.parse_name(database_name)
+        return f'databases/{name}.{ext}'
+
+
+    # Opens a new connection to the database file
+    def _connect(self):
+        # Pooled connections move between threads, but only one thread uses each at a time
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=not self.pool_size,
+                               cached_statements=self.cached_statements)
+        if self.journal_mode:
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        return conn
 
 
     def _initialize(self):
         # Makes the connection
-        self.conn = sqlite3.connect(f'databases/{self.name}.{self.ext}')
+        self.conn = self._connect()
         self.cursor = self.conn.cursor()
 
         # Creates the options table
@@ -44,59 +155,391 @@ class Database:
         # 3 - unspecified
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS seats 
                             (seat_id INTEGER PRIMARY KEY, age INTEGER, gender INTEGER)''')
-        self.conn.commit()
+        # Used to find the occupants by age bracket and gender without reading every seat
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS seats_by_age ON seats (age)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS seats_by_gender ON seats (gender, age)')
+
+        # Every booking and cancellation, revenue is negative for refunds
+        # Kinds are:
+        # 0 - booking
+        # 1 - cancellation
+        # 2 - relocation (the occupant moved to a new seat on a re-layout, revenue is what was paid)
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS seat_events
+                            (event_id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL, kind INTEGER,
+                            seat_id INTEGER, age INTEGER, gender INTEGER, revenue REAL)''')
+        # Used to find what was paid for a seat when it is refunded
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS seat_events_by_seat
+                            ON seat_events (seat_id, kind, event_id)''')
 
+        # Sales totals per minute, hour and day, kept up to date on every event
+        # Occupancy is the amount of occupied seats at the end of the bucket
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS sales_rollup
+                            (granularity INTEGER, bucket INTEGER, bookings INTEGER, cancellations INTEGER,
+                            revenue REAL, occupancy INTEGER, peak_occupancy INTEGER,
+                            PRIMARY KEY (granularity, bucket)) WITHOUT ROWID''')
 
-    # Saves a new seat occupant with the specified ID, age, and gender.
-    def save_seat(self, seat_id: int, age: int, gender: int):        
-        # Saves the new seat specification
-        self.cursor.execute('''INSERT INTO seats (seat_id, age, gender)
-                            VALUES (?,?,?)''', (seat_id, age, gender))
+        # Sequenced feed of every change to the room, so displays can follow the deltas
+        # Only the columns related to the change kind are filled
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS changes
+                            (change_id INTEGER PRIMARY KEY AUTOINCREMENT, kind INTEGER,
+                            seat_id INTEGER, age INTEGER, gender INTEGER,
+                            ticket_price REAL, rows INTEGER, columns INTEGER)''')
+        # Used to find the latest relayout, which every seat write checks
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS changes_by_kind ON changes (kind, change_id)')
         self.conn.commit()
+
+        # In pooled mode, the first connection becomes part of the pool
+        if self.pool_size:
+            self.pool = ConnectionPool(self._connect, self.pool_size, self.pool_timeout)
+            self.pool.add(self.conn)
+
+
+    # Provides the connection to be used by a single operation
+    # Rolls back whatever the operation left uncommitted if it fails
+    @contextmanager
+    def _lease(self):
+        if self.pool is None:
+            conn = self.conn
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+        else:
+            with self.pool.lease() as conn:
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+
+
+    # Closes every connection to the database
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        else:
+            self.conn.close()
+
+
+    # Copies the database into target_path using SQLite's online backup API
+    # Only a few pages are copied per step, pausing for sleep seconds in between so bookings can keep going
+    # Returns the amount of pages copied and the page size in bytes
+    def snapshot(self, target_path: str, pages: int = 64, sleep: float = 0.005, progress=None):
+        # The backup API only sleeps by itself when a step finds the database locked,
+        # so the pause between successful steps happens in the progress callback
+        def step(status, remaining, total):
+            if progress is not None:
+                progress(status, remaining, total)
+            if remaining and sleep:
+                time.sleep(sleep)
+
+        target = sqlite3.connect(target_path)
+        try:
+            with self._lease() as conn:
+                conn.backup(target, pages=pages, progress=step)
+                page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+        return page_count, page_size
+
+
+    # Records seat events with the current time and adds them to the rollups
+    # Must be called inside the write transaction, after the seats were changed
+    # Events are (kind, seat_id, age, gender, revenue) tuples
+    def _record_events(self, conn: sqlite3.Connection, events: list):
+        now = time.time()
+        conn.executemany('''INSERT INTO seat_events (created_at, kind, seat_id, age, gender, revenue)
+                         VALUES (?,?,?,?,?,?)''', [(now, *event) for event in events])
+
+        bookings = sum(1 for event in events if event[0] == BOOKING)
+        cancellations = len(events) - bookings
+        revenue = sum(event[4] for event in events)
+        occupancy = conn.execute('SELECT COUNT(*) FROM seats').fetchone()[0]
+        conn.executemany('''INSERT INTO sales_rollup (granularity, bucket, bookings, cancellations,
+                         revenue, occupancy, peak_occupancy) VALUES (?,?,?,?,?,?,?)
+                         ON CONFLICT (granularity, bucket) DO UPDATE SET
+                         bookings = bookings + excluded.bookings,
+                         cancellations = cancellations + excluded.cancellations,
+                         revenue = revenue + excluded.revenue,
+                         occupancy = excluded.occupancy,
+                         peak_occupancy = MAX(peak_occupancy, excluded.peak_occupancy)''',
+                         [(granularity, bucket_start(now, granularity), bookings, cancellations,
+                           revenue, occupancy, occupancy) for granularity in granularities])
+
+
+    # Appends a change to the change feed, must be called inside the write transaction
+    def _record_change(self, conn: sqlite3.Connection, kind: int, seat_id: int = None, age: int = None,
+                       gender: int = None, ticket_price: float = None, rows: int = None, columns: int = None):
+        conn.execute('''INSERT INTO changes (kind, seat_id, age, gender, ticket_price, rows, columns)
+                     VALUES (?,?,?,?,?,?,?)''', (kind, seat_id, age, gender, ticket_price, rows, columns))
+
+
+    # Saves a new seat occupant with the specified ID, age, gender and the price paid.
+    def save_seat(self, seat_id: int, age: int, gender: int, price: float = 0., layout: int = None):
+        self.save_seats([(seat_id, age, gender, price)], layout)
+
+
+    # The id of the latest relayout, or 0 if the room was never changed, see get_layout
+    _layout_query = 'SELECT COALESCE(MAX(change_id), 0) FROM changes WHERE kind = 4'
+
+
+    # Seat IDs only point to the seat they were computed for in the current layout, which a relayout changes
+    # even when the width stays the same (e.g. a new row moves every seat after it)
+    # Must be called inside the write transaction, so the layout can't change before the write commits
+    # Raises ValueError if the layout is not the current one, nothing is checked when layout is None
+    def _check_layout(self, conn: sqlite3.Connection, layout: int = None):
+        if layout is None:
+            return
+        if conn.execute(self._layout_query).fetchone()[0] != layout:
+            raise ValueError("The room layout changed meanwhile, reload its options")
+
+
+    # Saves many seat occupants at once, as (seat_id, age, gender, price) tuples
+    # Either every seat is saved or, if any of them is taken, none is (raises sqlite3.IntegrityError)
+    # layout is the one the IDs were computed in, see _check_layout
+    def save_seats(self, seats: list, layout: int = None):
+        with self._lease() as conn:
+            # Takes the write lock right away, so the occupancy count stays consistent
+            conn.execute('BEGIN IMMEDIATE')
+            self._check_layout(conn, layout)
+            # Saves the new seat specifications
+            conn.executemany('''INSERT INTO seats (seat_id, age, gender)
+                             VALUES (?,?,?)''', [seat[:3] for seat in seats])
+            self._record_events(conn, [(BOOKING, *seat) for seat in seats])
+            for seat_id, age, gender, _ in seats:
+                self._record_change(conn, SEAT_SAVED, seat_id, age, gender)
+            conn.commit()
     
 
+    # Selects the occupants along with the refund of what was paid for their last booking or relocation
+    _refund_query = '''SELECT seat_id, age, gender,
+                      -COALESCE((SELECT revenue FROM seat_events
+                                 WHERE seat_events.seat_id = seats.seat_id AND kind IN (0, 2)
+                                 ORDER BY event_id DESC LIMIT 1), 0)
+                      FROM seats'''
+
+
     # Removes the occupant with the specified ID
-    def remove_seat(self, seat_id: int):        
-        # Removes the seat based on its ID
-        self.cursor.execute('DELETE FROM seats WHERE seat_id = ?', (seat_id,))
-        self.conn.commit()
+    # layout is the one the ID was computed in, see _check_layout
+    def remove_seat(self, seat_id: int, layout: int = None):
+        with self._lease() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._check_layout(conn, layout)
+            occupant = conn.execute(self._refund_query + ' WHERE seat_id = ?', (seat_id,)).fetchone()
+            # Removes the seat based on its ID
+            conn.execute('DELETE FROM seats WHERE seat_id = ?', (seat_id,))
+            if occupant:
+                self._record_events(conn, [(CANCELLATION, *occupant)])
+                self._record_change(conn, SEAT_REMOVED, seat_id)
+            conn.commit()
     
 
     # Deletes every saved seat
-    def drop_seats(self):        
-        # Clears the seat table
-        self.cursor.execute('DELETE FROM seats')
-        self.conn.commit()
+    def drop_seats(self):
+        with self._lease() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            occupants = conn.execute(self._refund_query).fetchall()
+            # Clears the seat table
+            conn.execute('DELETE FROM seats')
+            if occupants:
+                self._record_events(conn, [(CANCELLATION, *occupant) for occupant in occupants])
+                self._record_change(conn, SEATS_DROPPED)
+            conn.commit()
     
     
     # Retrieves a list of every occupied seat
     def get_occupied(self):
-        self.cursor.execute("SELECT seat_id, age, gender FROM seats")
-        result = self.cursor.fetchall()
+        with self._lease() as conn:
+            result = conn.execute("SELECT seat_id, age, gender FROM seats").fetchall()
         return result
 
 
+    # Streams the occupied seats that match every given filter
+    # There is no ordering, so SQLite is free to walk the age, gender or ID index that fits best
+    # Ages are inclusive, and seat_ranges is a list of inclusive (first_id, last_id) tuples, like whole rows
+    # Yields (seat_id, age, gender) tuples
+    def find_seats(self, min_age: int = None, max_age: int = None, gender: int = None, seat_ranges: list = None):
+        conditions = []
+        parameters = []
+        if min_age is not None:
+            conditions.append('age >= ?')
+            parameters.append(min_age)
+        if max_age is not None:
+            conditions.append('age <= ?')
+            parameters.append(max_age)
+        if gender is not None:
+            conditions.append('gender = ?')
+            parameters.append(gender)
+        if seat_ranges is not None:
+            # No range means no seat
+            conditions.append('(' + (' OR '.join(['seat_id BETWEEN ? AND ?'] * len(seat_ranges)) or '0') + ')')
+            for seat_range in seat_ranges:
+                parameters.extend(seat_range)
+        query = 'SELECT seat_id, age, gender FROM seats'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+
+        # A room holds a few hundred seats at most, so they are read at once and the connection is released
+        # before the first one is yielded, a caller that stops iterating never keeps a pooled connection leased
+        with self._lease() as conn:
+            seats = conn.execute(query, parameters).fetchall()
+        yield from seats
+
+
     # Fetches the seat situation
     def get_seat(self, seat_id: int):
         # Returns a tuple containing the seat occupant's age and gender,
         # Or None if the seat is empty.
-        self.cursor.execute("SELECT age, gender FROM seats WHERE seat_id = ?", (seat_id,))
-        result = self.cursor.fetchone()
+        with self._lease() as conn:
+            result = conn.execute("SELECT age, gender FROM seats WHERE seat_id = ?", (seat_id,)).fetchone()
         return result
 
 
     #Saves the provided options to the database.
+    # Seat IDs depend on the width, so once seats are booked the dimensions only change with relayout_seats
+    # Raises ValueError if the dimensions change while there are seats
     def save_options(self, ticket_price: float, rows: int, columns: int):
-        # Overrides the options if they already exist
-        self.cursor.execute('''REPLACE INTO options (ticket_price, rows, columns)
-                            VALUES (?,?,?)''', (ticket_price, rows, columns))
-        self.conn.commit()
+        with self._lease() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            current = conn.execute('SELECT rows, columns FROM options').fetchone()
+            if current not in (None, (rows, columns)) and conn.execute('SELECT 1 FROM seats LIMIT 1').fetchone():
+                raise ValueError("The room has reservations, its dimensions can only change with a relayout")
+            self._replace_options(conn, ticket_price, rows, columns)
+            self._record_change(conn, OPTIONS_SAVED, ticket_price=ticket_price, rows=rows, columns=columns)
+            conn.commit()
+
+
+    # Overrides the options if they already exist
+    # The options table has no key for REPLACE to match, so the old row is deleted first
+    def _replace_options(self, conn: sqlite3.Connection, ticket_price: float, rows: int, columns: int):
+        conn.execute('DELETE FROM options')
+        conn.execute('''INSERT INTO options (ticket_price, rows, columns)
+                     VALUES (?,?,?)''', (ticket_price, rows, columns))
+
+
+    # Moves every occupant to its seat in a new layout, with a single set-based transaction
+    # new_row and new_column are SQL expressions of the old row (r) and column (c) of each seat,
+    # using named parameters, and may be NULL for seats that are removed
+    # Returns the displaced occupants as (seat_id, age, gender) tuples, whose new seat doesn't exist or is
+    # taken by an occupant that didn't move (or moved with a lower ID). When there are displaced occupants,
+    # nothing changes, unless drop_displaced is True, which cancels their reservations
+    # layout is the one the new layout was computed from, see _check_layout
+    # Raises ValueError if another manager changed the layout meanwhile
+    def relayout_seats(self, old_columns: int, ticket_price: float, rows: int, columns: int, new_row: str,
+                       new_column: str, parameters: dict = None, drop_displaced: bool = False, layout: int = None):
+        parameters = {**(parameters or {}), 'old_columns': old_columns, 'rows': rows, 'columns': columns}
+        with self._lease() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # The new seats are computed from the old IDs, which only make sense in the layout they were saved in
+            self._check_layout(conn, layout)
+            conn.execute('DROP TABLE IF EXISTS temp.relayout')
+            # Computes every new seat ID at once, and whether it fits the new layout
+            conn.execute(f'''CREATE TEMP TABLE relayout AS
+                         SELECT seat_id, age, gender, new_id, (new_id IS NOT NULL AND ROW_NUMBER() OVER (
+                             PARTITION BY new_id ORDER BY new_id = seat_id DESC, seat_id) = 1) AS fits
+                         FROM (SELECT seat_id, age, gender,
+                                   CASE WHEN new_row BETWEEN 0 AND :rows - 1 AND new_column BETWEEN 0 AND :columns - 1
+                                   THEN new_row * :columns + new_column END AS new_id
+                               FROM (SELECT seat_id, age, gender, {new_row} AS new_row, {new_column} AS new_column
+                                     FROM (SELECT seat_id, age, gender,
+                                           seat_id / :old_columns AS r, seat_id % :old_columns AS c FROM seats)))''',
+                         parameters)
+
+            displaced = conn.execute(self._refund_query + ''' WHERE seat_id IN
+                                     (SELECT seat_id FROM temp.relayout WHERE NOT fits)''').fetchall()
+            if displaced and not drop_displaced:
+                conn.rollback()
+                return [occupant[:3] for occupant in displaced]
+
+            # Moved occupants keep what they paid, so a later refund finds it under their new seat
+            relocations = conn.execute('''SELECT new_id, age, gender,
+                                       COALESCE((SELECT revenue FROM seat_events
+                                                 WHERE seat_events.seat_id = relayout.seat_id AND kind IN (0, 2)
+                                                 ORDER BY event_id DESC LIMIT 1), 0)
+                                       FROM temp.relayout WHERE fits AND new_id != seat_id''').fetchall()
+            conn.executemany('''INSERT INTO seat_events (created_at, kind, seat_id, age, gender, revenue)
+                             VALUES (?,?,?,?,?,?)''',
+                             [(time.time(), RELOCATION, *relocation) for relocation in relocations])
+
+            # Swaps the seats for their new layout
+            conn.execute('DELETE FROM seats')
+            conn.execute('INSERT INTO seats (seat_id, age, gender) SELECT new_id, age, gender FROM temp.relayout WHERE fits')
+            if displaced:
+                self._record_events(conn, [(CANCELLATION, *occupant) for occupant in displaced])
+            self._replace_options(conn, ticket_price, rows, columns)
+            self._record_change(conn, RELAYOUT, ticket_price=ticket_price, rows=rows, columns=columns)
+            conn.execute('DROP TABLE temp.relayout')
+            conn.commit()
+        return [occupant[:3] for occupant in displaced]
 
     
+    # Fetches the changes made after the given change id, from the oldest to the newest
+    # Returns tuples of (change_id, kind, seat_id, age, gender, ticket_price, rows, columns)
+    def get_changes(self, after: int = 0, limit: int = 1000):
+        with self._lease() as conn:
+            result = conn.execute('''SELECT change_id, kind, seat_id, age, gender, ticket_price, rows, columns
+                                  FROM changes WHERE change_id > ? ORDER BY change_id LIMIT ?''',
+                                  (after, limit)).fetchall()
+        return result
+
+
+    # Fetches the id of the latest change, or 0 if nothing has changed yet
+    def get_version(self):
+        with self._lease() as conn:
+            result = conn.execute('SELECT COALESCE(MAX(change_id), 0) FROM changes').fetchone()[0]
+        return result
+
+
+    # Fetches the latest change id, the occupied seats and the options as they were at that change
+    # Everything is read in the same transaction, so following the changes from there misses nothing
+    def get_snapshot(self):
+        with self._lease() as conn:
+            conn.execute('BEGIN')
+            version = conn.execute('SELECT COALESCE(MAX(change_id), 0) FROM changes').fetchone()[0]
+            occupied = conn.execute('SELECT seat_id, age, gender FROM seats').fetchall()
+            options = conn.execute('SELECT * FROM options').fetchone()
+            conn.commit()
+        return version, occupied, options
+
+
+    # Fetches the sales rollup buckets of the given granularity, from the oldest to the newest
+    # Returns tuples of (bucket, bookings, cancellations, revenue, occupancy, peak_occupancy)
+    def get_sales(self, granularity: int, since: float, until: float = None):
+        until = time.time() if until is None else until
+        with self._lease() as conn:
+            result = conn.execute('''SELECT bucket, bookings, cancellations, revenue, occupancy, peak_occupancy
+                                  FROM sales_rollup WHERE granularity = ? AND bucket BETWEEN ? AND ?
+                                  ORDER BY bucket''',
+                                  (granularity, bucket_start(since, granularity), until)).fetchall()
+        return result
+
+
+    # Fetches the bucket with the most bookings in the period, or None if nothing was booked
+    def get_peak_sales(self, granularity: int, since: float, until: float = None):
+        until = time.time() if until is None else until
+        with self._lease() as conn:
+            result = conn.execute('''SELECT bucket, bookings, cancellations, revenue, occupancy, peak_occupancy
+                                  FROM sales_rollup WHERE granularity = ? AND bucket BETWEEN ? AND ?
+                                  AND bookings > 0 ORDER BY bookings DESC, bucket DESC LIMIT 1''',
+                                  (granularity, bucket_start(since, granularity), until)).fetchone()
+        return result
+
+
+    # Fetches the current options along with the id of the latest relayout, which identifies the seat layout
+    # Returns a tuple of (layout, ticket price, rows, columns), or None if no options are set
+    def get_layout(self):
+        with self._lease() as conn:
+            result = conn.execute(f'SELECT ({self._layout_query}), ticket_price, rows, columns FROM options')\
+                .fetchone()
+        return result
+
+
     # Fetches the current options from the database
     def get_options(self):
         # Returns a tuple containing ticket price, number of lines, and number of columns,
         # Or None if no options are set.
-        self.cursor.execute("SELECT * FROM options")
-        result = self.cursor.fetchone()
+        with self._lease() as conn:
+            result = conn.execute("SELECT * FROM options").fetchone()
         return result
@@ -0,0 +1,200 @@
+#!/bin/python3
+# Serves the change feed of a room over a local socket, so displays receive deltas instead of polling
+# A single poller follows the changes table and fans the new changes out to every subscriber
+# Examples:
+#   python feed.py --port 8765 serve cine_room
+#   python feed.py --port 8765 follow --snapshot
+#
+# Protocol (one JSON object per line):
+#   The subscriber sends {"since": <change_id>} to resume after that change,
+#   or {"snapshot": true} to receive the current room first.
+#   The server answers with a "snapshot" message (if requested), then sends "change" messages
+#   as they happen, and a "heartbeat" with the latest change id whenever it is idle.
+#   After a "relayout" change every seat may have moved, so subscribers should reconnect with a snapshot.
+import argparse
+import json
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from db import Database, SEAT_SAVED, SEAT_REMOVED, SEATS_DROPPED, OPTIONS_SAVED, RELAYOUT
+
+change_kinds = {
+    SEAT_SAVED: "seat_saved",
+    SEAT_REMOVED: "seat_removed",
+    SEATS_DROPPED: "seats_dropped",
+    OPTIONS_SAVED: "options_saved",
+    # Every seat may have moved, subscribers should ask for a new snapshot
+    RELAYOUT: "relayout",
+}
+
+
+# Converts a change tuple from the database into a message, keeping only the columns of its kind
+def change_message(change: tuple):
+    change_id, kind, seat_id, age, gender, ticket_price, rows, columns = change
+    message = {"type": "change", "id": change_id, "kind": change_kinds[kind]}
+    if kind == SEAT_SAVED:
+        message.update(seat_id=seat_id, age=age, gender=gender)
+    elif kind == SEAT_REMOVED:
+        message.update(seat_id=seat_id)
+    elif kind in (OPTIONS_SAVED, RELAYOUT):
+        message.update(ticket_price=ticket_price, rows=rows, columns=columns)
+    return message
+
+
+# Follows the changes table and keeps the latest changes in memory for the subscribers
+class ChangeFeed:
+    def __init__(self, db: Database, interval: float = 0.1, backlog: int = 10000):
+        self.db = db
+        self.interval = interval
+        self.backlog = backlog
+        self.version = db.get_version()
+        # Every change after self.oldest is kept in self.recent
+        self.oldest = self.version
+        self.recent = deque()
+        self.condition = threading.Condition()
+        self.running = True
+
+    # Polls the database for new changes until stopped
+    def poll_forever(self):
+        while self.running:
+            try:
+                changes = self.db.get_changes(self.version)
+            except sqlite3.OperationalError as e:
+                # e.g. the database is locked during a checkpoint, the poller must outlive it
+                print(f"Could not read the changes, retrying: {e}")
+                time.sleep(self.interval)
+                continue
+            if not changes:
+                time.sleep(self.interval)
+                continue
+            with self.condition:
+                self.recent.extend(changes)
+                self.version = changes[-1][0]
+                # Forgets the oldest changes, subscribers that far behind read from the database
+                while len(self.recent) > self.backlog:
+                    self.oldest = self.recent.popleft()[0]
+                self.condition.notify_all()
+
+    # Waits up to timeout for changes after the given change id, and returns them
+    def changes_after(self, change_id: int, timeout: float):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > change_id or not self.running, timeout)
+            if change_id >= self.oldest:
+                # The newest changes are at the end, so only the tail is visited
+                changes = []
+                for change in reversed(self.recent):
+                    if change[0] <= change_id:
+                        break
+                    changes.append(change)
+                changes.reverse()
+                return changes
+        # The subscriber is too far behind the memory, catches up from the database
+        return self.db.get_changes(change_id)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+
+# Handles a single subscriber
+class FeedHandler(socketserver.StreamRequestHandler):
+    def send(self, message: dict):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+
+    def handle(self):
+        feed = self.server.feed
+        try:
+            request = json.loads(self.rfile.readline())
+            cursor = int(request.get("since", 0))
+        except (ValueError, TypeError, AttributeError):
+            self.send({"type": "error", "message": 'Send {"since": <change_id>} or {"snapshot": true}'})
+            return
+
+        try:
+            if request.get("snapshot"):
+                cursor, occupied, options = feed.db.get_snapshot()
+                self.send({"type": "snapshot", "id": cursor, "seats": occupied, "options": options})
+            while feed.running:
+                changes = feed.changes_after(cursor, self.server.heartbeat)
+                for change in changes:
+                    self.send(change_message(change))
+                    cursor = change[0]
+                if not changes:
+                    # Also detects subscribers that went away
+                    self.send({"type": "heartbeat", "id": cursor})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class FeedServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, feed: ChangeFeed, heartbeat: float = 5.):
+        super().__init__(address, FeedHandler)
+        self.feed = feed
+        self.heartbeat = heartbeat
+
+
+# Serves the change feed of a room until interrupted
+def serve(room: str, host: str, port: int, interval: float, heartbeat: float):
+    # The pooled database is shared by the poller and the subscriber threads
+    db = Database(room, pool_size=4)
+    feed = ChangeFeed(db, interval)
+    poller = threading.Thread(target=feed.poll_forever, daemon=True)
+    poller.start()
+    with FeedServer((host, port), feed, heartbeat) as server:
+        print(f"Serving the changes of {db.name}.{db.ext} on {host}:{port} (latest change: {feed.version})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print()
+        finally:
+            feed.stop()
+    poller.join()
+    db.close()
+
+
+# Connects to a feed server and yields every message received
+def follow(host: str, port: int, since: int = 0, snapshot: bool = False):
+    with socket.create_connection((host, port)) as connection:
+        request = {"snapshot": True} if snapshot else {"since": since}
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        for line in connection.makefile("rb"):
+            yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves or follows the change feed of a room.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="serves the changes of a room")
+    serve_parser.add_argument("room")
+    serve_parser.add_argument("--interval", type=float, default=0.1, help="seconds between polls when idle")
+    serve_parser.add_argument("--heartbeat", type=float, default=5., help="seconds between idle heartbeats")
+
+    follow_parser = commands.add_parser("follow", help="prints the changes served")
+    follow_parser.add_argument("--since", type=int, default=0, help="resumes after this change id")
+    follow_parser.add_argument("--snapshot", action="store_true", help="starts from the current room")
+
+    args = parser.parse_args()
+    match args.command:
+        case "serve":
+            serve(args.room, args.host, args.port, args.interval, args.heartbeat)
+        case "follow":
+            try:
+                for message in follow(args.host, args.port, args.since, args.snapshot):
+                    print(json.dumps(message))
+            except KeyboardInterrupt:
+                print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+#!/bin/python3
+# Synthetic load generator, simulates many cashiers working on the same room at once
+# Example: python loadgen.py cine_room --workers 8 --duration 10 --distribution hot
+import argparse
+import math
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from os import makedirs
+
+from cinema import Manager, databases_path, max_columns
+from db import Database
+
+# Operations a cashier can perform, in the order they are reported
+operations = ["book", "unbook", "get", "list"]
+journal_modes = ["delete", "truncate", "persist", "memory", "wal", "off"]
+
+
+# Converts a mix like "book=50,unbook=20,get=25,list=5" into a list of weights
+def parse_mix(text: str):
+    weights = dict.fromkeys(operations, 0.)
+    for item in text.split(","):
+        try:
+            operation, weight = item.split("=")
+            weight = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Malformed mix entry: {item!r}")
+        if operation not in weights:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {operation!r}")
+        if weight < 0:
+            raise argparse.ArgumentTypeError(f"The weight of {operation} can't be negative")
+        weights[operation] = weight
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("At least one operation needs a positive weight")
+    return [weights[operation] for operation in operations]
+
+
+# Chooses a seat, either uniformly or concentrated around the center of the room
+def pick_seat(rng: random.Random, rows: int, columns: int, distribution: str):
+    if distribution == "uniform":
+        return rng.randrange(rows), rng.randrange(columns)
+    # Hot seats: a normal distribution around the center, clamped to the room limits
+    row = round(rng.gauss((rows - 1) / 2, rows / 6))
+    column = round(rng.gauss((columns - 1) / 2, columns / 6))
+    return min(max(row, 0), rows - 1), min(max(column, 0), columns - 1)
+
+
+# Opens a database configured for the load test
+def open_manager(settings: dict, pool_size: int = 0):
+    db = Database(settings["database"], pool_size, settings["journal_mode"], settings["busy_timeout"] / 1000)
+    manager = Manager()
+    manager.set_database(db)
+    return manager
+
+
+# A single cashier, runs operations until the deadline and returns what it measured
+# It must be a module level function so it can be sent to worker processes
+def run_worker(settings: dict):
+    rng = random.Random(settings["seed"])
+    # Pooled cashiers share a single manager, the others open their own connection
+    manager = settings.get("manager") or open_manager(settings)
+
+    latencies = {operation: [] for operation in operations}
+    conflicts = 0    # Bookings on a seat that was already taken, or taken by another cashier meanwhile
+    lock_errors = 0  # Operations that gave up waiting for the database lock
+
+    # Wall clock bounds of the measured window, comparable between processes,
+    # so the startup of the pool and the opening of the database are not counted
+    started = time.time()
+    deadline = time.perf_counter() + settings["duration"]
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, settings["mix"])[0]
+        row, column = pick_seat(rng, manager.rows, manager.columns, settings["distribution"])
+
+        start = time.perf_counter()
+        try:
+            match operation:
+                case "book":
+                    if not manager.book_seat(row, column, rng.randint(1, 90), rng.randrange(4)):
+                        conflicts += 1
+                case "unbook":
+                    manager.unbook_seat(row, column)
+                case "get":
+                    manager.get_seat(row, column)
+                case "list":
+                    manager.seat_list()
+        except sqlite3.OperationalError as e:
+            # Only lock contention is expected, anything else is a real error
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            lock_errors += 1
+        latencies[operation].append(time.perf_counter() - start)
+
+        # Time the cashier takes to talk to the next customer
+        if settings["think_time"]:
+            time.sleep(rng.expovariate(1 / settings["think_time"]))
+
+    finished = time.time()
+
+    if "manager" not in settings:
+        manager.db.close()
+    return {"latencies": latencies, "conflicts": conflicts, "lock_errors": lock_errors,
+            "started": started, "finished": finished}
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(ordered: list, percent: float):
+    if not ordered:
+        return 0.
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+# Prints a line with the amount of operations and its latency percentiles in milliseconds
+def print_latency_line(name: str, samples: list, elapsed: float):
+    ordered = sorted(samples)
+    print(f"{name:<8}{len(ordered):>9}{len(ordered) / elapsed:>11.1f}",
+          *(f"{percentile(ordered, p) * 1000:>9.3f}" for p in (50, 95, 99)), sep="")
+
+
+# Merges the results of every worker and prints the final report
+# The elapsed time spans from the first worker starting its measurements to the last one finishing
+def print_report(results: list):
+    elapsed = max(result["finished"] for result in results) - min(result["started"] for result in results)
+    merged = {operation: [] for operation in operations}
+    for result in results:
+        for operation, samples in result["latencies"].items():
+            merged[operation].extend(samples)
+    total = sum(len(samples) for samples in merged.values())
+    bookings = len(merged["book"])
+
+    print(f"{'op':<8}{'count':>9}{'ops/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for operation in operations:
+        if merged[operation]:
+            print_latency_line(operation, merged[operation], elapsed)
+    print_latency_line("total", [sample for samples in merged.values() for sample in samples], elapsed)
+    print()
+
+    conflicts = sum(result["conflicts"] for result in results)
+    lock_errors = sum(result["lock_errors"] for result in results)
+    print(f"Elapsed: {elapsed:.2f}s, throughput: {total / elapsed:.1f} ops/s")
+    print(f"Booking conflicts: {conflicts} ({conflicts / max(bookings, 1) * 100:.2f}% of bookings)")
+    print(f"Lock errors: {lock_errors} ({lock_errors / max(total, 1) * 100:.2f}% of operations)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates many concurrent cashiers against a room database.")
+    parser.add_argument("database", nargs="?", default="loadgen_room", help="room database name")
+    parser.add_argument("--workers", type=int, default=4, help="amount of concurrent cashiers")
+    parser.add_argument("--mode", choices=["thread", "process"], default="process",
+                        help="run the cashiers as threads or processes")
+    parser.add_argument("--duration", type=float, default=10., help="seconds to run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("book=40,unbook=20,get=30,list=10"),
+                        help="operation weights, e.g. book=40,unbook=20,get=30,list=10")
+    parser.add_argument("--think-time", type=float, default=0., help="mean pause between operations in seconds")
+    parser.add_argument("--distribution", choices=["uniform", "hot"], default="uniform",
+                        help="uniform seats or hot center seats")
+    parser.add_argument("--journal-mode", choices=journal_modes, default="delete", help="SQLite journal mode")
+    parser.add_argument("--pooled", action="store_true",
+                        help="thread cashiers share one pooled database instead of opening their own")
+    parser.add_argument("--busy-timeout", type=int, default=5000, help="milliseconds to wait for a lock")
+    parser.add_argument("--rows", type=int, default=10, help="rows of a new room (1-26)")
+    parser.add_argument("--columns", type=int, default=max_columns, help=f"columns of a new room (1-{max_columns})")
+    parser.add_argument("--price", type=float, default=20., help="ticket price of a new room")
+    parser.add_argument("--reset", action="store_true", help="clears the room before starting")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    args = parser.parse_args()
+    if args.pooled and args.mode != "thread":
+        parser.error("--pooled requires --mode thread")
+    # The same limits as initialize_manager, rows are named after the alphabet
+    if not 1 <= args.rows <= 26:
+        parser.error("--rows must be within 1-26")
+    if not 1 <= args.columns <= max_columns:
+        parser.error(f"--columns must be within 1-{max_columns}")
+
+    # Prepares the room, creating it if necessary
+    makedirs(databases_path, exist_ok=True)
+    manager = Manager()
+    if not manager.set_database(Database(args.database, journal_mode=args.journal_mode)):
+        manager.set_options(args.price, args.rows, args.columns)
+    if args.reset:
+        manager.db.drop_seats()
+    manager.db.close()
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    settings = [{
+        "database": args.database,
+        "duration": args.duration,
+        "mix": args.mix,
+        "think_time": args.think_time,
+        "distribution": args.distribution,
+        "journal_mode": args.journal_mode,
+        "busy_timeout": args.busy_timeout,
+        "seed": seed + worker,
+    } for worker in range(args.workers)]
+    if args.pooled:
+        shared = open_manager(settings[0], args.workers)
+        for worker_settings in settings:
+            worker_settings["manager"] = shared
+
+    print(f"Running {args.workers} {args.mode} cashiers on {manager.db.name}.{manager.db.ext}",
+          f"({manager.rows}x{manager.columns}, {args.journal_mode} journal, seed {seed})")
+    executor = ThreadPoolExecutor if args.mode == "thread" else ProcessPoolExecutor
+    with executor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_worker, settings))
+    print_report(results)
+    if args.pooled:
+        shared.db.close()
+
+
+if __name__ == '__main__':
+    main()
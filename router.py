@@ -0,0 +1,314 @@
+#!/bin/python3
+# Spreads the rooms across worker processes, so busy rooms don't share a GIL or a SQLite writer with quiet ones
+# Each worker owns the managers of its rooms, and the router sends every request to the worker of its room
+# The front speaks pickle, so anyone holding the key can run code in the router, and the key is required
+# Examples:
+#   CINEMA_ROUTER_AUTHKEY=<secret> python router.py --port 8766 serve --workers 4
+#   CINEMA_ROUTER_AUTHKEY=<secret> python router.py --port 8766 stats
+import argparse
+import ipaddress
+import os
+import socket
+import sqlite3
+import threading
+import time
+from multiprocessing import AuthenticationError, Pipe, Process
+from multiprocessing.connection import Client, Listener
+from os import path
+
+from cinema import Manager
+from db import Database
+
+# Manager methods that can be called through the router, the room options are only changed locally
+allowed_methods = {
+    "book_seat", "unbook_seat", "get_seat", "seat_list", "find_seats",
+    "find_group_seats", "book_group", "render_map", "occupancy_snapshot", "sales_pace", "peak_hour",
+}
+# Environment variable read when --authkey is not given
+authkey_variable = "CINEMA_ROUTER_AUTHKEY"
+
+
+# Messages start with their type, so no room or method name can be mistaken for another request:
+#   ("call", room, method, args) calls a Manager method on a room
+#   ("stats",) asks for the health and statistics
+# Answers are (succeeded, result or exception) tuples
+
+
+# Runs inside each worker process, answering messages until it receives None
+def worker_main(connection):
+    managers = {}
+    started = time.time()
+    requests = errors = 0
+    busy = 0.
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        # The health check, answered without touching any room
+        if request[0] == "stats":
+            connection.send((True, {
+                "pid": os.getpid(), "rooms": sorted(managers), "requests": requests, "errors": errors,
+                "busy_seconds": busy, "uptime_seconds": time.time() - started,
+            }))
+            continue
+
+        start = time.perf_counter()
+        requests += 1
+        try:
+            kind, room, method, args = request
+            if kind != "call":
+                raise ValueError(f"Unknown message type: {kind!r}")
+            if method not in allowed_methods:
+                raise AttributeError(f"The method {method} can't be called through the router")
+            manager = managers.get(Database.path_of(room))
+            if manager is None:
+                # Opens the room the first time it is requested, the manager is kept for the next requests
+                # Opening a missing room would create an empty one
+                if not path.exists(Database.path_of(room)):
+                    raise LookupError(f"The room {room} doesn't exist")
+                manager = Manager()
+                if not manager.set_database(Database(room)):
+                    manager.db.close()
+                    raise LookupError(f"The room {room} is not initialized")
+                managers[manager.db.path] = manager
+            result = getattr(manager, method)(*args)
+            # Generators can't be sent to other processes
+            if method == "find_seats":
+                result = list(result)
+            answer = True, result
+        except Exception as e:
+            errors += 1
+            answer = False, e
+        busy += time.perf_counter() - start
+        connection.send(answer)
+
+    for manager in managers.values():
+        manager.db.close()
+
+
+# Whether the room exists and is initialized, read without creating or changing anything
+def room_exists(room: str):
+    room_path = Database.path_of(room)
+    if not path.exists(room_path):
+        return False
+    try:
+        connection = sqlite3.connect(f"file:{room_path}?mode=ro", uri=True)
+        try:
+            return connection.execute("SELECT 1 FROM options").fetchone() is not None
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        # Not a room database, or one without the options table
+        return False
+
+
+# The router side of a worker process
+class Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.rooms = set()
+        # A worker answers one request at a time, so the router threads take turns on its pipe
+        self.lock = threading.Lock()
+        self.process = None
+        self.connection = None
+        self.start()
+
+    def start(self):
+        self.connection, worker_connection = Pipe()
+        self.process = Process(target=worker_main, args=(worker_connection,), daemon=True,
+                               name=f"cinema-worker-{self.index}")
+        self.process.start()
+        worker_connection.close()
+
+    # Sends a message and waits for its answer, restarting the worker if it died
+    # The room state lives in the database, so a restarted worker just opens its rooms again
+    def request(self, message: tuple):
+        with self.lock:
+            try:
+                self.connection.send(message)
+                return self.connection.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                self.process.join(1)
+                self.start()
+                raise ConnectionError(f"The worker {self.index} stopped while handling {message[0]}")
+
+    def stop(self):
+        with self.lock:
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.connection.close()
+
+
+# Assigns each room to a worker process and routes the requests of the room to it
+class RoomRouter:
+    def __init__(self, workers: int = None):
+        self.workers = [Worker(index) for index in range(workers or os.cpu_count() or 1)]
+        self.assignments = {}
+        self._lock = threading.Lock()
+
+    # Finds the worker of a room, assigning new rooms to the worker with the fewest rooms
+    # Raises LookupError if the room doesn't exist, so unknown names never take a worker slot
+    def worker_for(self, room: str):
+        # Different spellings of the same room (e.g. with or without the extension) share a worker
+        key = Database.path_of(room)
+        with self._lock:
+            worker = self.assignments.get(key)
+            if worker is None:
+                if not room_exists(room):
+                    raise LookupError(f"The room {room} doesn't exist")
+                worker = min(self.workers, key=lambda candidate: len(candidate.rooms))
+                worker.rooms.add(key)
+                self.assignments[key] = worker
+        return worker
+
+    # Calls a Manager method on a room, raising whatever the method raised
+    def call(self, room: str, method: str, *args):
+        succeeded, result = self.worker_for(room).request(("call", room, method, args))
+        if not succeeded:
+            raise result
+        return result
+
+    # The health and statistics of every worker
+    def stats(self):
+        result = []
+        for worker in self.workers:
+            try:
+                _, worker_stats = worker.request(("stats",))
+                worker_stats["alive"] = True
+            except ConnectionError:
+                worker_stats = {"alive": False}
+            worker_stats["worker"] = worker.index
+            worker_stats["assigned_rooms"] = sorted(worker.rooms)
+            result.append(worker_stats)
+        return result
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+# Answers the requests of a single client of the front
+def handle_client(router: RoomRouter, connection):
+    with connection:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                return
+            try:
+                match request:
+                    case ("stats",):
+                        answer = True, router.stats()
+                    case ("call", room, method, args):
+                        answer = True, router.call(room, method, *args)
+                    case _:
+                        raise ValueError("Unknown message")
+            except Exception as e:
+                answer = False, e
+            connection.send(answer)
+
+
+# Whether every address of the host is a loopback address
+def is_loopback(host: str):
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses)
+
+
+# Serves the router over a local socket until interrupted
+# Raises ValueError without an authkey
+def serve(workers: int, host: str, port: int, authkey: bytes):
+    if not authkey:
+        raise ValueError("The router needs an authkey")
+    with RoomRouter(workers) as router, Listener((host, port), authkey=authkey) as listener:
+        print(f"Routing rooms to {len(router.workers)} workers on {host}:{port}")
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, OSError):
+                    # A client with the wrong key, or one that went away during the handshake
+                    continue
+                threading.Thread(target=handle_client, args=(router, connection), daemon=True).start()
+        except KeyboardInterrupt:
+            print()
+
+
+# Talks to a router front from another process
+class RouterClient:
+    def __init__(self, authkey: bytes, host: str = "127.0.0.1", port: int = 8766):
+        self.connection = Client((host, port), authkey=authkey)
+
+    def _request(self, request: tuple):
+        self.connection.send(request)
+        succeeded, result = self.connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    # Calls a Manager method on a room, raising whatever the method raised
+    def call(self, room: str, method: str, *args):
+        return self._request(("call", room, method, args))
+
+    # The health and statistics of every worker
+    def stats(self):
+        return self._request(("stats",))
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routes the rooms to a pool of worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--authkey", default=os.environ.get(authkey_variable),
+                        help=f"shared secret of the front, {authkey_variable} by default")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="serves on a non-loopback host, the traffic is authenticated but not encrypted")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="starts the workers and the front")
+    serve_parser.add_argument("--workers", type=int, default=None, help="amount of worker processes")
+    commands.add_parser("stats", help="prints the health of every worker")
+
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error(f"--authkey or {authkey_variable} is required")
+    match args.command:
+        case "serve":
+            # Anyone who can reach the port can try to guess the key
+            if not args.allow_remote and not is_loopback(args.host):
+                parser.error(f"{args.host} is not a loopback address, use --allow-remote to serve on it anyway")
+            serve(args.workers, args.host, args.port, args.authkey.encode())
+        case "stats":
+            client = RouterClient(args.authkey.encode(), args.host, args.port)
+            for worker_stats in client.stats():
+                if not worker_stats["alive"]:
+                    print(f"Worker {worker_stats['worker']}: not responding")
+                    continue
+                print(f"Worker {worker_stats['worker']} (pid {worker_stats['pid']}):",
+                      f"{worker_stats['requests']} requests, {worker_stats['errors']} errors,",
+                      f"{worker_stats['busy_seconds']:.3f}s busy, up for {worker_stats['uptime_seconds']:.0f}s,",
+                      f"rooms: {', '.join(worker_stats['assigned_rooms']) or 'none'}")
+            client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import sys
+from os import makedirs, path
+
+import pytest
+
+# The modules live at the root of the repository
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from cache import render_cache  # noqa: E402
+from cinema import Manager  # noqa: E402
+from db import Database  # noqa: E402
+
+
+# A 3x4 room priced at 10, saved in a temporary databases folder
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makedirs("databases")
+    # Every test room has the same relative path, so the shared cache must not carry maps between tests
+    render_cache.clear()
+    manager = Manager()
+    manager.set_database(Database("test_room"))
+    manager.set_options(10., 3, 4)
+    yield manager
+    manager.db.close()
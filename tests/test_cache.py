@@ -0,0 +1,56 @@
+from cache import RenderCache, pack_bits, render_cache
+
+
+def test_pack_bits():
+    assert pack_bits([]) == b""
+    assert pack_bits([True, False, False, False, False, False, False, False, True]) == b"\x01\x01"
+
+
+def test_hits_and_misses():
+    cache = RenderCache()
+    assert cache.get("room", 1, None) is None
+    cache.put("room", 1, None, "frame", b"\x01")
+    assert cache.get("room", 1, None) == ("frame", b"\x01")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_newer_version_replaces_the_older_one():
+    cache = RenderCache()
+    cache.put("room", 1, None, "old", b"")
+    cache.put("room", 2, None, "new", b"")
+    assert cache.get("room", 1, None) is None
+    assert cache.get("room", 2, None) == ("new", b"")
+    # An outdated render arriving late is ignored
+    cache.put("room", 1, None, "old", b"")
+    assert cache.get("room", 1, None) is None
+    assert cache.size == len("new") * 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RenderCache(max_bytes=2 * 3 * 4)
+    cache.put("a", 1, None, "aaaa", b"")
+    cache.put("b", 1, None, "bbbb", b"")
+    cache.get("a", 1, None)
+    cache.put("c", 1, None, "cccc", b"")
+    assert cache.get("b", 1, None) is None
+    assert cache.get("a", 1, None) is not None and cache.get("c", 1, None) is not None
+    assert cache.size <= cache.max_bytes
+
+
+def test_maps_are_rendered_again_after_a_change(manager):
+    first = manager.render_map()
+    hits = render_cache.hits
+    assert manager.render_map() is first
+    assert render_cache.hits == hits + 1
+    manager.book_seat(0, 0, 30, 0)
+    assert manager.render_map() != first
+    assert manager.occupancy_snapshot() == pack_bits([True] + [False] * 11)
+    assert manager.occupancy_snapshot((0, 1, 0, 2)) == pack_bits([True, False])
+
+
+def test_lists_are_accepted_in_the_cache_key(manager):
+    manager.book_seat(2, 1, 12, 0)
+    frame = manager.render_map([0, 3, 0, 4], (0, 17, None, [2]))
+    hits = render_cache.hits
+    assert manager.render_map((0, 3, 0, 4), (0, 17, None, (2,))) is frame
+    assert render_cache.hits == hits + 1
@@ -0,0 +1,32 @@
+def book_sample(manager):
+    # (row, column, age, gender)
+    for row, column, age, gender in [(0, 0, 8, 0), (0, 3, 15, 1), (1, 1, 30, 1), (2, 2, 70, 0), (2, 3, 17, 3)]:
+        assert manager.book_seat(row, column, age, gender)
+
+
+def test_filters(manager):
+    book_sample(manager)
+    assert set(manager.db.find_seats()) == {(0, 8, 0), (3, 15, 1), (5, 30, 1), (10, 70, 0), (11, 17, 3)}
+    # Ages are inclusive
+    assert {seat[0] for seat in manager.db.find_seats(max_age=17)} == {0, 3, 11}
+    assert {seat[0] for seat in manager.db.find_seats(15, 30)} == {3, 5, 11}
+    assert {seat[0] for seat in manager.db.find_seats(gender=1)} == {3, 5}
+    assert {seat[0] for seat in manager.db.find_seats(0, 17, 1)} == {3}
+    assert {seat[0] for seat in manager.db.find_seats(seat_ranges=[(0, 3), (8, 11)])} == {0, 3, 10, 11}
+    assert list(manager.db.find_seats(seat_ranges=[])) == []
+
+
+def test_labels_by_row(manager):
+    book_sample(manager)
+    assert sorted(manager.find_seats(max_age=17)) == ["A1", "A4", "C4"]
+    assert sorted(manager.find_seats(rows=[0, 2], gender=0)) == ["A1", "C3"]
+    assert list(manager.find_seats(min_age=100)) == []
+
+
+def test_every_seat_is_found_in_a_full_room(manager):
+    manager.set_options(10., 26, 18)
+    for seat_id in range(0, 26 * 18, 2):
+        assert manager.book_seat(seat_id // 18, seat_id % 18, seat_id % 90, seat_id % 4)
+    assert sorted(seat[0] for seat in manager.db.find_seats()) == list(range(0, 26 * 18, 2))
+    minors = {seat_id for seat_id in range(0, 26 * 18, 2) if seat_id % 90 <= 17}
+    assert {seat[0] for seat in manager.db.find_seats(max_age=17)} == minors
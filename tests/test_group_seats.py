@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+
+def book(manager, *seats):
+    for row, column in seats:
+        assert manager.book_seat(row, column, 30, 0)
+
+
+# The score find_group_seats minimizes, recomputed from the seats it returned
+def score(manager, seats):
+    rows = sorted({row for row, _ in seats})
+    per_row = {row: sorted(column for seat_row, column in seats if seat_row == row) for row in rows}
+    width = max(len(columns) for columns in per_row.values())
+    start = next(columns[0] for columns in per_row.values() if len(columns) == width)
+    height = len(rows)
+    return (2 * (width + height) + abs(rows[0] + (height - 1) / 2 - (manager.rows - 1) / 2)
+            + abs(start + (width - 1) / 2 - (manager.columns - 1) / 2))
+
+
+# Tries every block without pruning, returning the best score or None
+def best_score(manager, party_size, spacing):
+    occupied = {seat[0] for seat in manager.db.get_occupied()}
+
+    def is_free(row, start, width):
+        first = max(start - spacing, 0)
+        last = min(start + width + spacing, manager.columns)
+        return all(row * manager.columns + column not in occupied for column in range(first, last))
+
+    best = None
+    for height in range(1, manager.rows + 1):
+        width = -(-party_size // height)
+        if width > manager.columns or (height - 1) * width >= party_size:
+            continue
+        remainder = party_size - (height - 1) * width
+        for top in range(manager.rows - height + 1):
+            for start in range(manager.columns - width + 1):
+                for partial_row in (top + height - 1, top):
+                    partial_start = start + (width - remainder) // 2
+                    if is_free(partial_row, partial_start, remainder) and all(
+                            is_free(row, start, width) for row in range(top, top + height) if row != partial_row):
+                        candidate = (2 * (width + height) + abs(top + (height - 1) / 2 - (manager.rows - 1) / 2)
+                                     + abs(start + (width - 1) / 2 - (manager.columns - 1) / 2))
+                        best = candidate if best is None else min(best, candidate)
+    return best
+
+
+def test_compact_central_block(manager):
+    assert manager.find_group_seats(4) == [(0, 1), (0, 2), (1, 1), (1, 2)]
+
+
+def test_partial_end_row_is_centered(manager):
+    assert manager.find_group_seats(5) == [(0, 1), (0, 2), (1, 1), (1, 2), (2, 1)]
+
+
+def test_spacing_keeps_seats_free_around_the_party(manager):
+    book(manager, (1, 0))
+    assert manager.find_group_seats(2) == [(1, 1), (1, 2)]
+    assert manager.find_group_seats(2, spacing=1) == [(1, 2), (1, 3)]
+
+
+def test_no_place_for_the_party(manager):
+    assert manager.find_group_seats(13) is None
+    # Only single columns are left, so a pair fits vertically but no wider block does
+    book(manager, *[(row, column) for row in range(3) for column in (1, 3)])
+    assert manager.find_group_seats(2) == [(0, 2), (1, 2)]
+    assert manager.find_group_seats(4) is None
+
+
+# The search stops early on the score, which must never lose the best block
+@pytest.mark.parametrize("seed", range(20))
+def test_pruning_finds_the_best_score(manager, seed):
+    rng = random.Random(seed)
+    manager.set_options(10., 6, 9)
+    book(manager, *rng.sample([(row, column) for row in range(6) for column in range(9)], rng.randrange(25)))
+    for party_size in range(1, 12):
+        for spacing in (0, 1):
+            seats = manager.find_group_seats(party_size, spacing)
+            expected = best_score(manager, party_size, spacing)
+            if expected is None:
+                assert seats is None
+            else:
+                assert len(seats) == party_size
+                assert score(manager, seats) == expected
+
+
+def test_book_group_books_the_found_block(manager):
+    occupants = [(30, 0), (10, 1), (40, 2), (12, 3)]
+    seats = manager.book_group(occupants)
+    assert seats == [(0, 1), (0, 2), (1, 1), (1, 2)]
+    assert [manager.get_seat(*seat) for seat in seats] == occupants
+
+
+def test_book_group_books_exactly_the_given_seats(manager):
+    seats = [(2, 0), (2, 1)]
+    assert manager.book_group([(30, 0), (31, 1)], seats=seats) == seats
+    assert manager.get_seat(2, 0) == (30, 0) and manager.get_seat(2, 1) == (31, 1)
+
+
+def test_book_group_given_seats_are_all_or_nothing(manager):
+    book(manager, (0, 1))
+    assert manager.book_group([(30, 0), (31, 1)], seats=[(0, 0), (0, 1)]) is None
+    assert manager.get_seat(0, 0) is None
+
+
+def test_book_group_needs_a_seat_per_occupant(manager):
+    with pytest.raises(ValueError):
+        manager.book_group([(30, 0)], seats=[(0, 0), (0, 1)])
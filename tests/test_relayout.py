@@ -0,0 +1,146 @@
+import pytest
+
+from cinema import Manager
+from db import Database, CANCELLATION, RELOCATION
+
+
+def events(manager, kind):
+    with manager.db._lease() as conn:
+        return conn.execute('SELECT seat_id, age, gender, revenue FROM seat_events WHERE kind = ? ORDER BY event_id',
+                            (kind,)).fetchall()
+
+
+def test_insert_column_moves_every_seat(manager):
+    manager.book_seat(0, 0, 30, 0)
+    manager.book_seat(1, 2, 10, 1)
+    assert manager.insert_column(1) == []
+    assert (manager.rows, manager.columns) == (3, 5)
+    assert [seat[:4] for seat in manager.seat_list()] == [("A", 1, 30, 0), ("B", 4, 10, 1)]
+    # The moved occupant keeps what was paid
+    assert events(manager, RELOCATION) == [(8, 10, 1, 5.)]
+
+
+def test_unmoved_seat_wins_and_layout_is_kept(manager):
+    manager.book_seat(0, 0, 30, 0)
+    manager.book_seat(0, 1, 40, 1)
+    # A1 moves onto A2, whose occupant stays where it is
+    displaced = manager.shift_block((0, 1, 0, 1), 0, 1)
+    assert displaced == [("A", 1, 30, 0)]
+    assert [seat[:4] for seat in manager.seat_list()] == [("A", 1, 30, 0), ("A", 2, 40, 1)]
+    assert events(manager, RELOCATION) == []
+    assert manager.db.get_options() == (10., 3, 4)
+
+
+def test_lower_id_wins_between_moved_seats(manager):
+    manager.book_seat(0, 1, 30, 0)
+    manager.book_seat(0, 2, 40, 1)
+    # Every seat of the row moves to its first column
+    displaced = manager._relayout(3, 4, new_column="0")
+    assert displaced == [("A", 3, 40, 1)]
+    # Nothing moves while someone is displaced
+    assert [seat[:4] for seat in manager.seat_list()] == [("A", 2, 30, 0), ("A", 3, 40, 1)]
+
+
+def test_dropped_occupants_are_refunded(manager):
+    manager.book_seat(0, 0, 30, 0)
+    manager.book_seat(1, 3, 10, 1)
+    manager.book_seat(2, 0, 70, 2)
+    displaced = manager.remove_column(3, drop_displaced=True)
+    assert displaced == [("B", 4, 10, 1)]
+    assert (manager.rows, manager.columns) == (3, 3)
+    assert [seat[:4] for seat in manager.seat_list()] == [("A", 1, 30, 0), ("C", 1, 70, 2)]
+    # The refund is what the child paid, half the price
+    assert events(manager, CANCELLATION) == [(7, 10, 1, -5.)]
+
+
+def test_relocated_occupant_is_refunded_what_was_paid(manager):
+    manager.book_seat(0, 1, 10, 1)
+    manager.insert_row(0)
+    assert manager.unbook_seat(1, 1)
+    assert events(manager, CANCELLATION) == [(5, 10, 1, -5.)]
+
+
+def test_stale_manager_writes_are_rejected(manager):
+    other = Manager()
+    other.set_database(Database("test_room"))
+    manager.book_seat(0, 0, 30, 0)
+    manager.insert_column(0)
+    # The ids of the old layout point to other seats, so nothing is written and the layout is reloaded
+    with pytest.raises(ValueError):
+        other.book_seat(1, 0, 30, 0)
+    assert other.columns == 5
+    assert other.book_seat(2, 4, 30, 0)
+    # The width stays the same, but every seat moves one row back, so B2 holds whoever was at A2
+    manager.insert_row(0)
+    with pytest.raises(ValueError):
+        other.unbook_seat(1, 1)
+    manager.remove_row(0)
+    with pytest.raises(ValueError):
+        other.book_group([(30, 0), (31, 1)], seats=[(2, 0), (2, 1)])
+    assert [seat[:2] for seat in manager.seat_list()] == [("A", 2), ("C", 5)]
+    other.db.close()
+
+
+def test_stale_manager_lists_the_new_layout(manager):
+    other = Manager()
+    other.set_database(Database("test_room"))
+    manager.book_seat(2, 3, 30, 0)
+    manager.insert_column(0)
+    assert [seat[:2] for seat in other.seat_list()] == [("C", 5)]
+    assert list(other.find_seats()) == ["C5"]
+
+
+@pytest.mark.parametrize("change", [
+    lambda manager: manager.insert_row(-3),
+    lambda manager: manager.insert_row(4),
+    lambda manager: manager.remove_row(3, drop_displaced=True),
+    lambda manager: manager.remove_row(-1),
+    lambda manager: manager.insert_column(5),
+    lambda manager: manager.remove_column(4),
+    lambda manager: manager.shift_block((0, 4, 0, 1), 0, 1),
+    lambda manager: manager.shift_block((1, 1, 0, 1), 0, 1),
+])
+def test_out_of_range_indexes_change_nothing(manager, change):
+    manager.book_seat(2, 3, 30, 0)
+    with pytest.raises(KeyError):
+        change(manager)
+    assert manager.db.get_options() == (10., 3, 4)
+    assert [seat[:2] for seat in manager.seat_list()] == [("C", 4)]
+    assert events(manager, CANCELLATION) == []
+
+
+def test_rows_and_columns_can_be_appended(manager):
+    manager.book_seat(2, 3, 30, 0)
+    assert manager.insert_row(3) == [] and manager.insert_column(4) == []
+    assert (manager.rows, manager.columns) == (4, 5)
+    assert [seat[:2] for seat in manager.seat_list()] == [("C", 4)]
+
+
+def test_room_size_is_limited(manager):
+    with pytest.raises(ValueError):
+        manager.resize(3, 19)
+    with pytest.raises(ValueError):
+        manager.resize(27, 4)
+
+
+def test_set_options_keeps_the_dimensions_of_a_booked_room(manager):
+    manager.book_seat(1, 0, 30, 0)
+    with pytest.raises(ValueError):
+        manager.set_options(10., 3, 5)
+    assert (manager.rows, manager.columns) == (3, 4)
+    assert manager.db.get_options() == (10., 3, 4)
+    assert [seat[:2] for seat in manager.seat_list()] == [("B", 1)]
+    # The price can still change
+    manager.set_options(12., 3, 4)
+    assert manager.db.get_options() == (12., 3, 4)
+
+
+def test_relayout_from_a_stale_layout_is_rejected(manager):
+    other = Manager()
+    other.set_database(Database("test_room"))
+    manager.book_seat(0, 0, 30, 0)
+    manager.shift_block((0, 1, 0, 1), 1, 0)
+    with pytest.raises(ValueError):
+        other._relayout(3, 4, "r + 1")
+    assert [seat[:2] for seat in manager.seat_list()] == [("B", 1)]
+    other.db.close()
@@ -0,0 +1,39 @@
+import time
+from datetime import datetime
+
+from db import MINUTE, HOUR, DAY, bucket_start
+
+
+def test_bucket_start_is_aligned_to_local_time():
+    now = time.time()
+    for granularity in (MINUTE, HOUR, DAY):
+        start = bucket_start(now, granularity)
+        assert start <= now < start + granularity
+        assert bucket_start(start, granularity) == start
+    assert datetime.fromtimestamp(bucket_start(now, HOUR)).minute == 0
+    assert datetime.fromtimestamp(bucket_start(now, DAY)).time().hour == 0
+
+
+def test_rollups_count_bookings_cancellations_and_revenue(manager):
+    assert manager.book_seat(0, 0, 30, 0)
+    assert manager.book_seat(0, 1, 10, 1)
+    assert manager.unbook_seat(0, 1)
+    since = time.time() - 2 * MINUTE
+    for granularity in (MINUTE, HOUR, DAY):
+        buckets = manager.db.get_sales(granularity, since)
+        assert sum(bucket[1] for bucket in buckets) == 2
+        assert sum(bucket[2] for bucket in buckets) == 1
+        # The child paid half the price and was refunded
+        assert sum(bucket[3] for bucket in buckets) == 10.
+        assert buckets[-1][4] == 1
+        assert max(bucket[5] for bucket in buckets) == 2
+
+
+def test_sales_pace_and_peak_hour(manager):
+    assert manager.sales_pace() == (0, 0, 0, 0)
+    assert manager.peak_hour() is None
+    assert manager.book_seat(1, 1, 30, 0)
+    bookings, cancellations, revenue, per_hour = manager.sales_pace(30)
+    assert (bookings, cancellations, revenue, per_hour) == (1, 0, 10., 2.)
+    hour, bookings, cancellations, revenue = manager.peak_hour()
+    assert (hour.minute, bookings, cancellations, revenue) == (0, 1, 0, 10.)